@@ -0,0 +1,181 @@
+import ast
+import importlib
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+# Generated from the source files without importing them:
+#   {"include_disabled": bool, "files": [source files relative to commands/], "commands": {name: "module.path:ClassName"}}
+MANIFEST_PATH = os.path.join(__location__, "command_manifest.json")
+
+# Files in the commands package that never define commands
+IGNORED_FILES = {"__init__.py", "base.py", "registry.py"}
+
+
+def _command_name(class_node: ast.ClassDef) -> Optional[str]:
+    """ Returns the value assigned to self.cmd in a class's __init__, or None if it doesn't set one """
+    for node in class_node.body:
+        if isinstance(node, ast.FunctionDef) and node.name == "__init__":
+            for statement in ast.walk(node):
+                if not isinstance(statement, ast.Assign):
+                    continue
+                for target in statement.targets:
+                    if (isinstance(target, ast.Attribute) and target.attr == "cmd"
+                            and isinstance(target.value, ast.Name) and target.value.id == "self"
+                            and isinstance(statement.value, ast.Constant) and isinstance(statement.value.value, str)):
+                        return statement.value.value
+    return None
+
+
+def _command_files(commands_dir: str, include_disabled: bool) -> List[str]:
+    """ Returns the paths of every python file in the commands directory that may define commands """
+    paths = []
+    for root, dirs, files in os.walk(commands_dir):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__" and (include_disabled or d != "disabled"))
+        for file_name in sorted(files):
+            if file_name.endswith(".py") and file_name not in IGNORED_FILES:
+                paths.append(os.path.join(root, file_name))
+    return paths
+
+
+def _relative_files(commands_dir: str, include_disabled: bool) -> List[str]:
+    """ Returns the command files relative to the commands directory, as stored in the manifest """
+    return [os.path.relpath(path, commands_dir) for path in _command_files(commands_dir, include_disabled)]
+
+
+def generate_manifest(commands_dir: str = __location__, include_disabled: bool = False) -> Dict[str, Any]:
+    """ Builds the command manifest by parsing the command modules, nothing is imported """
+    package_root = os.path.dirname(commands_dir)
+    files = _command_files(commands_dir, include_disabled)
+    commands = {}
+    for path in files:
+        module = os.path.splitext(os.path.relpath(path, package_root))[0].replace(os.sep, ".")
+        with open(path, "r") as r:
+            tree = ast.parse(r.read(), filename=path)
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef):
+                name = _command_name(node)
+                if name is not None:
+                    if name in commands:
+                        print(f"Duplicate command {name} in {module}, keeping {commands[name]}")
+                        continue
+                    commands[name] = f"{module}:{node.name}"
+    return {
+        "include_disabled": include_disabled,
+        "files": _relative_files(commands_dir, include_disabled),
+        "commands": commands
+    }
+
+
+def write_manifest(manifest: Dict[str, Any], manifest_path: str = MANIFEST_PATH) -> None:
+    """ Saves the command manifest to disk """
+    with open(manifest_path, "w+") as w:
+        json.dump(manifest, w, indent=4, sort_keys=True)
+
+
+def read_manifest(manifest_path: str = MANIFEST_PATH) -> Optional[Dict[str, Any]]:
+    """ Returns the manifest from disk, None if it is missing or unreadable """
+    try:
+        with open(manifest_path, "r") as r:
+            return json.load(r)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def manifest_is_stale(manifest: Optional[Dict[str, Any]], commands_dir: str = __location__,
+                      manifest_path: str = MANIFEST_PATH, include_disabled: bool = False) -> bool:
+    """ Checks if a manifest no longer matches the command files, only file names and times are read
+
+    A manifest is stale if it was built with a different include_disabled, if command files were added,
+    removed or renamed since, or if any command file was modified after it was written.
+    """
+    if not isinstance(manifest, dict) or "commands" not in manifest:
+        return True
+    if manifest.get("include_disabled") != include_disabled:
+        return True
+    if manifest.get("files") != _relative_files(commands_dir, include_disabled):
+        return True
+    manifest_time = os.path.getmtime(manifest_path)
+    return any(os.path.getmtime(path) > manifest_time for path in _command_files(commands_dir, include_disabled))
+
+
+class CommandRegistry:
+    """ CommandRegistry class maps command names to command classes, importing each module only when one of its commands is first used """
+    def __init__(self, client_instance, manifest_path: str = MANIFEST_PATH, include_disabled: bool = False,
+                 commands_dir: str = __location__):
+        self.client = client_instance
+        self.manifest_path = manifest_path
+        self.commands_dir = commands_dir
+        self.include_disabled = include_disabled
+        self.manifest = {}
+        self.commands = {}
+        # Module path -> seconds spent importing it
+        self.import_times = {}
+
+    def load(self) -> None:
+        """ Loads the manifest, regenerating it first if it is missing or out of date """
+        manifest = read_manifest(self.manifest_path)
+        if manifest_is_stale(manifest, self.commands_dir, self.manifest_path, self.include_disabled):
+            manifest = generate_manifest(self.commands_dir, self.include_disabled)
+            write_manifest(manifest, self.manifest_path)
+        self.manifest = manifest["commands"]
+
+    def has_command(self, name: str) -> bool:
+        """ Checks if a command exists without importing it """
+        return name in self.manifest
+
+    def command_names(self) -> List[str]:
+        """ Returns the names of every known command """
+        return sorted(self.manifest)
+
+    def get_command(self, name: str) -> Optional[Any]:
+        """ Returns the command instance for a name, importing its module on first use. None if the command doesn't exist """
+        command = self.commands.get(name)
+        if command is not None:
+            return command
+        target = self.manifest.get(name)
+        if target is None:
+            return None
+        module_path, class_name = target.split(":")
+        command_class = getattr(self._import(module_path), class_name)
+        command = command_class(self.client)
+        self.commands[name] = command
+        return command
+
+    def preload(self) -> None:
+        """ Imports every command module up front, useful to measure the full import cost """
+        for name in self.command_names():
+            self.get_command(name)
+
+    def _import(self, module_path: str):
+        """ Imports a module and records how long it took """
+        module = sys.modules.get(module_path)
+        if module is not None:
+            return module
+        start = time.perf_counter()
+        module = importlib.import_module(module_path)
+        self.import_times[module_path] = time.perf_counter() - start
+        return module
+
+    def import_profile(self) -> List[Tuple[str, float]]:
+        """ Returns the imported command modules and their import time in seconds, slowest first """
+        return sorted(self.import_times.items(), key=lambda item: item[1], reverse=True)
+
+    def print_import_profile(self) -> None:
+        """ Prints the import time of every command module loaded so far """
+        profile = self.import_profile()
+        total = sum(seconds for _, seconds in profile)
+        print(f"Loaded {len(profile)} of {len(self.manifest)} command modules in {total * 1000:.1f}ms")
+        for module_path, seconds in profile:
+            print(f"    {module_path}: {seconds * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    # Regenerate the manifest: python -m commands.registry [--include-disabled]
+    generated = generate_manifest(include_disabled="--include-disabled" in sys.argv)
+    write_manifest(generated)
+    print(f"Wrote {len(generated['commands'])} commands to {MANIFEST_PATH}")
@@ -0,0 +1,686 @@
+""" Replays recorded or synthetic Discord event traces through the moderation commands and storage layer to load test them
+
+Traces are JSONL files, one event per line:
+    {"t": 0.25, "type": "message", "guild_id": "1", "channel_id": "10", "user_id": "100", "author_is_mod": false, "content": "hello"}
+    {"t": 0.50, "type": "join", "guild_id": "1", "user_id": "101", "username": "user101"}
+
+"t" is the offset in seconds from the start of the trace. Messages starting with the bot prefix are dispatched to
+the matching command through the CommandRegistry, other messages go through the curse word check. Discord is
+replaced by fake guilds, channels and members, and MongoDB by in-memory collections, so nothing leaves the process.
+The modules the commands import (discord, bot, commands.base, helpers) are faked when they can't be imported.
+
+--discord-latency makes every fake Discord call (sending, fetching members, banning, timeouts) await a sleep, which
+is what lets events overlap and --concurrency have an effect. --storage-latency blocks like synchronous pymongo
+does, so it holds up the whole event loop and serializes events no matter the concurrency.
+
+Usage:
+    python replay_harness.py --generate trace.jsonl --events 5000 --rate 200
+    python replay_harness.py trace.jsonl --speedup 10 --concurrency 50 --discord-latency 0.05 --storage-latency 0.002
+"""
+import argparse
+import asyncio
+import copy
+import importlib.util
+import json
+import math
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import uuid
+from types import ModuleType, SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+from commands.registry import CommandRegistry
+from storage_management import StorageManagement
+
+MOD_ROLE_ID = 1
+LOG_CHANNEL_ID = 1249380931781791855
+
+
+# === Local storage stand-in ===
+
+_MISSING = object()
+
+
+def _get_path(doc: Dict[str, Any], path: str) -> Any:
+    """ Returns the value at a dotted path in a document, _MISSING if it isn't set """
+    value = doc
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return _MISSING
+        value = value[key]
+    return value
+
+
+def _set_path(doc: Dict[str, Any], path: str, value: Any) -> None:
+    """ Sets the value at a dotted path in a document, creating parent documents as needed """
+    keys = path.split(".")
+    for key in keys[:-1]:
+        doc = doc.setdefault(key, {})
+    doc[keys[-1]] = value
+
+
+def _matches(doc: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    """ Checks a document against a query using equality and the $in, $lt, $lte, $gt and $gte operators """
+    for path, condition in (query or {}).items():
+        value = _get_path(doc, path)
+        if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+            for operator, operand in condition.items():
+                if operator == "$in":
+                    if value not in operand:
+                        return False
+                elif value is _MISSING or value is None:
+                    return False
+                elif operator == "$lt" and not value < operand:
+                    return False
+                elif operator == "$lte" and not value <= operand:
+                    return False
+                elif operator == "$gt" and not value > operand:
+                    return False
+                elif operator == "$gte" and not value >= operand:
+                    return False
+        elif value is _MISSING or value != condition:
+            return False
+    return True
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, int]]) -> Dict[str, Any]:
+    """ Applies a top-level inclusion or exclusion projection to a copy of a document """
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    fields = {path.split(".")[0]: include for path, include in projection.items()}
+    if any(fields.values()):
+        return {key: value for key, value in doc.items() if key == "_id" or key in fields}
+    return {key: value for key, value in doc.items() if key not in fields}
+
+
+class MemoryCursor:
+    """ MemoryCursor class mimics the parts of a pymongo cursor used by the storage layer """
+    def __init__(self, docs: List[Dict[str, Any]]):
+        self.docs = docs
+
+    def sort(self, key, direction: int = 1) -> "MemoryCursor":
+        keys = key if isinstance(key, list) else [(key, direction)]
+        # Stable sorts applied from the last key to the first give a multi-key sort, missing fields sort first
+        for path, order in reversed(keys):
+            present = [doc for doc in self.docs if _get_path(doc, path) is not _MISSING]
+            missing = [doc for doc in self.docs if _get_path(doc, path) is _MISSING]
+            present.sort(key=lambda doc: _get_path(doc, path), reverse=order < 0)
+            self.docs = present + missing if order < 0 else missing + present
+        return self
+
+    def limit(self, count: int) -> "MemoryCursor":
+        if count:
+            self.docs = self.docs[:count]
+        return self
+
+    def batch_size(self, size: int) -> "MemoryCursor":
+        return self
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.docs)
+
+
+class MemoryCollection:
+    """ MemoryCollection class is an in-memory stand-in for the pymongo collection calls made by StorageManagement
+
+    Every call blocks for latency seconds, like a synchronous pymongo round-trip would.
+    """
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.docs = {}
+        self.operations = 0
+
+    def _round_trip(self) -> None:
+        self.operations += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _apply_update(self, doc: Dict[str, Any], update: Dict[str, Any], inserted: bool) -> None:
+        for operator, fields in update.items():
+            for path, value in fields.items():
+                if operator == "$set" or (operator == "$setOnInsert" and inserted):
+                    _set_path(doc, path, copy.deepcopy(value))
+                elif operator == "$inc":
+                    current = _get_path(doc, path)
+                    _set_path(doc, path, (0 if current is _MISSING else current) + value)
+                elif operator == "$push":
+                    current = _get_path(doc, path)
+                    _set_path(doc, path, ([] if current is _MISSING else current) + [copy.deepcopy(value)])
+                elif operator == "$pull":
+                    current = _get_path(doc, path)
+                    if current is not _MISSING:
+                        if isinstance(value, dict):
+                            _set_path(doc, path, [item for item in current if not (isinstance(item, dict) and _matches(item, value))])
+                        else:
+                            _set_path(doc, path, [item for item in current if item != value])
+
+    def _upsert(self, query: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+        doc = {path: value for path, value in query.items() if not isinstance(value, dict)}
+        doc.setdefault("_id", uuid.uuid4().hex)
+        self._apply_update(doc, update, inserted=True)
+        self.docs[doc["_id"]] = doc
+        return doc
+
+    def _find_first(self, query: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if query and "_id" in query and not isinstance(query["_id"], dict):
+            doc = self.docs.get(query["_id"])
+            return doc if doc is not None and _matches(doc, query) else None
+        return next((doc for doc in self.docs.values() if _matches(doc, query)), None)
+
+    def create_index(self, *args, **kwargs) -> None:
+        pass
+
+    def find(self, query: Dict[str, Any] = None, projection: Dict[str, int] = None) -> MemoryCursor:
+        self._round_trip()
+        return MemoryCursor([_project(doc, projection) for doc in self.docs.values() if _matches(doc, query)])
+
+    def find_one(self, query: Dict[str, Any] = None, projection: Dict[str, int] = None) -> Optional[Dict[str, Any]]:
+        self._round_trip()
+        doc = self._find_first(query)
+        return _project(doc, projection) if doc is not None else None
+
+    def count_documents(self, query: Dict[str, Any]) -> int:
+        self._round_trip()
+        return sum(1 for doc in self.docs.values() if _matches(doc, query))
+
+    def insert_one(self, doc: Dict[str, Any]) -> SimpleNamespace:
+        self._round_trip()
+        doc.setdefault("_id", uuid.uuid4().hex)
+        self.docs[doc["_id"]] = copy.deepcopy(doc)
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    def insert_many(self, docs: List[Dict[str, Any]]) -> SimpleNamespace:
+        self._round_trip()
+        for doc in docs:
+            doc.setdefault("_id", uuid.uuid4().hex)
+            self.docs[doc["_id"]] = copy.deepcopy(doc)
+        return SimpleNamespace(inserted_ids=[doc["_id"] for doc in docs])
+
+    def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> SimpleNamespace:
+        self._round_trip()
+        doc = self._find_first(query)
+        if doc is not None:
+            self._apply_update(doc, update, inserted=False)
+            return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+        if upsert:
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=self._upsert(query, update)["_id"])
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+
+    def find_one_and_update(self, query: Dict[str, Any], update: Dict[str, Any], projection: Dict[str, int] = None,
+                            upsert: bool = False, return_document: bool = False) -> Optional[Dict[str, Any]]:
+        self._round_trip()
+        doc = self._find_first(query)
+        if doc is None:
+            if not upsert:
+                return None
+            doc = self._upsert(query, update)
+            return _project(doc, projection) if return_document else None
+        before = _project(doc, projection)
+        self._apply_update(doc, update, inserted=False)
+        return _project(doc, projection) if return_document else before
+
+    def delete_one(self, query: Dict[str, Any]) -> SimpleNamespace:
+        self._round_trip()
+        doc = self._find_first(query)
+        if doc is not None:
+            del self.docs[doc["_id"]]
+        return SimpleNamespace(deleted_count=0 if doc is None else 1)
+
+    def delete_many(self, query: Dict[str, Any]) -> SimpleNamespace:
+        self._round_trip()
+        ids = [doc_id for doc_id, doc in self.docs.items() if _matches(doc, query)]
+        for doc_id in ids:
+            del self.docs[doc_id]
+        return SimpleNamespace(deleted_count=len(ids))
+
+    def bulk_write(self, operations: List[Any], ordered: bool = True) -> SimpleNamespace:
+        """ Applies pymongo UpdateOne operations, counted as a single round-trip """
+        self._round_trip()
+        for operation in operations:
+            doc = self._find_first(operation._filter)
+            if doc is not None:
+                self._apply_update(doc, operation._doc, inserted=False)
+            elif operation._upsert:
+                self._upsert(operation._filter, operation._doc)
+        return SimpleNamespace(acknowledged=True)
+
+
+class MemoryDatabase:
+    """ MemoryDatabase class hands out in-memory collections by name, like a pymongo database """
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.collections = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self.collections:
+            self.collections[name] = MemoryCollection(self.latency)
+        return self.collections[name]
+
+
+class MemoryStorage(StorageManagement):
+    """ MemoryStorage class runs the real StorageManagement logic on top of in-memory collections instead of MongoDB """
+    def __init__(self, latency: float = 0.0):
+        super().__init__(MemoryDatabase(latency))
+        # Keep any archive writes away from the real moderation_archive directory
+        self._archive_dir = tempfile.TemporaryDirectory()
+        self.moderation_archive_path = self._archive_dir.name
+
+    def operation_count(self) -> int:
+        """ Returns the number of collection calls made so far """
+        return sum(collection.operations for collection in self.db.collections.values())
+
+
+# === Fake Discord client ===
+
+async def _discord_round_trip(latency: float) -> None:
+    """ Stands in for a request to the Discord API, yielding to the event loop like a real one would """
+    if latency:
+        await asyncio.sleep(latency)
+
+
+class FakeChannel:
+    """ FakeChannel class records messages instead of sending them """
+    def __init__(self, channel_id: int, latency: float = 0.0):
+        self.id = channel_id
+        self.latency = latency
+        self.sent = 0
+
+    async def send(self, content: str = None, embed: Any = None) -> None:
+        await _discord_round_trip(self.latency)
+        self.sent += 1
+
+
+class FakeMember:
+    """ FakeMember class carries the member fields the moderation commands read """
+    def __init__(self, user_id: int, name: str, is_mod: bool = False, latency: float = 0.0):
+        self.id = user_id
+        self.latency = latency
+        self.name = name
+        self.display_name = name
+        self.mention = f"<@{user_id}>"
+        self.bot = False
+        self.roles = [SimpleNamespace(id=MOD_ROLE_ID, name="Moderator")] if is_mod else []
+        self.guild_permissions = SimpleNamespace(administrator=is_mod, ban_members=is_mod, manage_messages=is_mod)
+
+    async def timeout(self, *args, **kwargs) -> None:
+        await _discord_round_trip(self.latency)
+
+
+class FakeGuild:
+    """ FakeGuild class keeps members and channels in memory and accepts bans and unbans """
+    def __init__(self, guild_id: int, latency: float = 0.0):
+        self.id = guild_id
+        self.latency = latency
+        self.members = {}
+        self.channels = {LOG_CHANNEL_ID: FakeChannel(LOG_CHANNEL_ID, latency)}
+        self.bans = set()
+
+    def member(self, user_id: int, name: str = None, is_mod: bool = False) -> FakeMember:
+        member = self.members.get(user_id)
+        if member is None:
+            member = FakeMember(user_id, name or f"user{user_id}", is_mod, self.latency)
+            self.members[user_id] = member
+        return member
+
+    def channel(self, channel_id: int) -> FakeChannel:
+        if channel_id not in self.channels:
+            self.channels[channel_id] = FakeChannel(channel_id, self.latency)
+        return self.channels[channel_id]
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        return self.channels.get(channel_id)
+
+    async def fetch_member(self, user_id: int) -> Optional[FakeMember]:
+        await _discord_round_trip(self.latency)
+        return self.members.get(user_id)
+
+    async def ban(self, user: FakeMember, reason: str = None) -> None:
+        await _discord_round_trip(self.latency)
+        self.bans.add(user.id)
+
+    async def unban(self, user: FakeMember, reason: str = None) -> None:
+        await _discord_round_trip(self.latency)
+        self.bans.discard(user.id)
+
+
+class FakeBot:
+    """ FakeBot class stands in for ModerationBot as the client passed to commands """
+    def __init__(self, storage: StorageManagement, prefix: str = "!", latency: float = 0.0):
+        self.storage = storage
+        self.prefix = prefix
+        # Seconds each fake Discord API call takes
+        self.latency = latency
+        self.user = FakeMember(0, "bot")
+        self.guilds = {}
+
+    async def guild(self, guild_id: int) -> FakeGuild:
+        """ Returns the fake guild for an ID, registering it in storage the first time it is seen """
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            guild = FakeGuild(guild_id, self.latency)
+            self.guilds[guild_id] = guild
+            await self.storage.add_guild(guild_id)
+            await self.storage.update_guild(guild_id, {"mod_roles": [MOD_ROLE_ID], "log_channel_id": LOG_CHANNEL_ID})
+        return guild
+
+
+# === Fake command dependencies ===
+
+class _FakeCommand:
+    """ Stand-in for commands.base.Command """
+
+
+class _FakeEmbedBuilder:
+    """ Stand-in for helpers.embed_builder.EmbedBuilder """
+    def __init__(self, event: str):
+        self.event = event
+        self.fields = []
+
+    async def add_field(self, name: str, value: str, inline: bool = True) -> None:
+        self.fields.append((name, value))
+
+    async def get_embed(self) -> SimpleNamespace:
+        return SimpleNamespace(event=self.event, fields=self.fields)
+
+
+async def _fake_author_is_mod(author: FakeMember, storage: StorageManagement) -> bool:
+    """ Stand-in for helpers.misc_functions.author_is_mod: administrators and members with the mod role """
+    return author.guild_permissions.administrator or any(role.id == MOD_ROLE_ID for role in author.roles)
+
+
+def _fake_is_integer(value: str) -> bool:
+    try:
+        int(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _fake_parse_duration(duration: str) -> int:
+    """ Stand-in for helpers.misc_functions.parse_duration: '1w3d5h30m20s' or plain seconds, -1 if invalid """
+    if _fake_is_integer(duration):
+        return int(duration)
+    units = {"w": 604800, "d": 86400, "h": 3600, "m": 60, "s": 1}
+    parts = re.findall(r"(\d+)([wdhms])", duration)
+    if not parts or "".join(amount + unit for amount, unit in parts) != duration:
+        return -1
+    return sum(int(amount) * units[unit] for amount, unit in parts)
+
+
+def _fake_module(name: str, **attributes) -> ModuleType:
+    module = ModuleType(name)
+    module.__dict__.update(attributes)
+    return module
+
+
+def _module_available(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def install_fake_modules() -> List[str]:
+    """ Puts fakes for the command modules' dependencies into sys.modules, only for those that can't be imported
+
+    Returns:
+        The names of the modules that were faked
+    """
+    errors = SimpleNamespace(NotFound=type("NotFound", (Exception,), {}),
+                             HTTPException=type("HTTPException", (Exception,), {}))
+    fakes = {
+        "discord": lambda: _fake_module("discord", Message=SimpleNamespace, Member=FakeMember, errors=errors),
+        "bot": lambda: _fake_module("bot", ModerationBot=FakeBot),
+        "commands.base": lambda: _fake_module("commands.base", Command=_FakeCommand),
+        "helpers": lambda: _fake_module("helpers", __path__=[]),
+        "helpers.embed_builder": lambda: _fake_module("helpers.embed_builder", EmbedBuilder=_FakeEmbedBuilder),
+        "helpers.misc_functions": lambda: _fake_module(
+            "helpers.misc_functions",
+            author_is_mod=_fake_author_is_mod,
+            is_integer=_fake_is_integer,
+            is_valid_duration=lambda duration: duration > 0,
+            parse_duration=_fake_parse_duration
+        )
+    }
+    faked = []
+    for name, build in fakes.items():
+        if name not in sys.modules and not _module_available(name):
+            sys.modules[name] = build()
+            faked.append(name)
+    return faked
+
+
+# === Replay ===
+
+class ReplayHarness:
+    """ ReplayHarness class feeds trace events through the commands and storage layer and collects timings """
+    def __init__(self, bot: FakeBot, registry: CommandRegistry):
+        self.bot = bot
+        self.storage = bot.storage
+        self.registry = registry
+        # Event kind -> end-to-end latencies in seconds
+        self.latencies = {}
+        self.loop_lag = []
+        self.errors = {}
+
+    async def handle_event(self, event: Dict[str, Any]) -> str:
+        """ Processes a single trace event, returns the kind of event it was handled as """
+        guild = await self.bot.guild(int(event["guild_id"]))
+        user_id = int(event["user_id"])
+
+        if event["type"] == "join":
+            guild.member(user_id, event.get("username"))
+            await self.storage.create_user_profile(user_id, event.get("username") or f"user{user_id}")
+            return "join"
+
+        author = guild.member(user_id, event.get("username"), event.get("author_is_mod", False))
+        message = SimpleNamespace(
+            id=event.get("message_id", 0),
+            content=event.get("content", ""),
+            author=author,
+            guild=guild,
+            channel=guild.channel(int(event.get("channel_id", 0))),
+            mentions=[]
+        )
+
+        if message.content.startswith(self.bot.prefix):
+            parts = message.content[len(self.bot.prefix):].split()
+            command = self.registry.get_command(parts[0]) if parts else None
+            if command is None:
+                return "command:unknown"
+            await command.execute(message, args=parts[1:])
+            return f"command:{parts[0]}"
+
+        # Curse word path: warn the author, work out the timeout and log it as a moderation action
+        for word in message.content.lower().split():
+            if await self.storage.is_curse_word(word):
+                warning_count = await self.storage.add_warning(guild.id, user_id, word)
+                duration = await self.storage.get_timeout_duration(warning_count)
+                if duration:
+                    await author.timeout(duration)
+                await self.storage.log_moderation_action("warning", guild.id, user_id, self.bot.user.id,
+                                                         reason=f"Used curse word: {word}", duration=duration)
+                return "curse"
+        await self.storage.increment_user_stat(user_id, "messages_sent", username=author.name)
+        return "message"
+
+    async def _run_event(self, event: Dict[str, Any], due: float, semaphore: asyncio.Semaphore) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            kind = await self.handle_event(event)
+        except Exception as e:
+            # Failed events are counted but kept out of the latency figures
+            name = type(e).__name__
+            self.errors[name] = self.errors.get(name, 0) + 1
+            return
+        finally:
+            semaphore.release()
+        self.latencies.setdefault(kind, []).append(loop.time() - due)
+
+    async def _monitor_loop_lag(self, interval: float, stop: asyncio.Event) -> None:
+        """ Measures how late the event loop wakes up from a sleep, which is time it spent blocked """
+        loop = asyncio.get_running_loop()
+        while not stop.is_set():
+            start = loop.time()
+            await asyncio.sleep(interval)
+            self.loop_lag.append(max(0.0, loop.time() - start - interval))
+
+    async def replay(self, events: Iterator[Dict[str, Any]], speedup: float = 1.0, concurrency: int = 100) -> float:
+        """ Replays events at their trace offsets divided by speedup, a speedup of 0 replays as fast as possible
+
+        Returns:
+            The wall clock duration of the replay in seconds
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+        stop = asyncio.Event()
+        monitor = asyncio.ensure_future(self._monitor_loop_lag(0.01, stop))
+        tasks = set()
+
+        start = loop.time()
+        for event in events:
+            due = start + event.get("t", 0) / speedup if speedup > 0 else loop.time()
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # Time spent waiting for a free slot counts towards the event's latency
+            await semaphore.acquire()
+            task = asyncio.ensure_future(self._run_event(event, due, semaphore))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        duration = loop.time() - start
+
+        stop.set()
+        await monitor
+        return duration
+
+    def report(self, duration: float) -> str:
+        """ Formats throughput, latency percentiles per event kind and event loop lag """
+        total = sum(len(values) for values in self.latencies.values())
+        lines = [
+            f"Events: {total} completed, {sum(self.errors.values())} failed, in {duration:.2f}s "
+            f"({total / duration if duration else 0:.1f} events/s)",
+            f"Storage calls: {self.storage.operation_count()}" if isinstance(self.storage, MemoryStorage) else "",
+            "Latency (ms)          count      p50      p95      p99      max"
+        ]
+        everything = [value for values in self.latencies.values() for value in values]
+        for kind, values in sorted(self.latencies.items()) + [("all", everything)]:
+            lines.append(f"  {kind:<18} {len(values):>7} " + " ".join(
+                f"{percentile(values, p) * 1000:>8.2f}" for p in (50, 95, 99, 100)))
+        lines.append("Event loop lag (ms)   p50 {:.2f}  p99 {:.2f}  max {:.2f}".format(
+            *(percentile(self.loop_lag, p) * 1000 for p in (50, 99, 100))))
+        if self.errors:
+            lines.append("Errors: " + ", ".join(f"{name} x{count}" for name, count in sorted(self.errors.items())))
+        return "\n".join(line for line in lines if line)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """ Nearest-rank percentile, 0 for an empty list """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def read_trace(path: str) -> Iterator[Dict[str, Any]]:
+    """ Streams events from a JSONL trace file, skipping blank lines """
+    with open(path, "r") as r:
+        for line in r:
+            if line.strip():
+                yield json.loads(line)
+
+
+def generate_trace(path: str, events: int = 1000, rate: float = 100.0, guilds: int = 5, users: int = 500,
+                   prefix: str = "!", seed: int = 0) -> None:
+    """ Writes a synthetic trace of chat messages, curse words, joins, bans and unbans arriving at a Poisson rate """
+    rng = random.Random(seed)
+    words = ["hello", "gg", "anyone", "online", "lol", "nice", "build", "server", "when", "update"]
+    curses = ["fuck", "bitch", "bastard"]
+    mods = {guild: 10_000 + guild for guild in range(1, guilds + 1)}
+    banned = {guild: [] for guild in mods}
+
+    t = 0.0
+    with open(path, "w+") as w:
+        for _ in range(events):
+            t += rng.expovariate(rate)
+            guild = rng.randint(1, guilds)
+            user = rng.randint(1, users)
+            roll = rng.random()
+            event = {"t": round(t, 6), "guild_id": str(guild), "channel_id": "10"}
+            if roll < 0.10:
+                event.update({"type": "join", "user_id": str(user), "username": f"user{user}"})
+            elif roll < 0.16:
+                banned[guild].append(user)
+                event.update({"type": "message", "user_id": str(mods[guild]), "author_is_mod": True,
+                              "content": f"{prefix}ban {user} 1h spamming"})
+            elif roll < 0.19 and banned[guild]:
+                target = banned[guild].pop(rng.randrange(len(banned[guild])))
+                event.update({"type": "message", "user_id": str(mods[guild]), "author_is_mod": True,
+                              "content": f"{prefix}unban {target}"})
+            else:
+                content = rng.choices(words, k=rng.randint(1, 8))
+                if rng.random() < 0.05:
+                    content.insert(rng.randrange(len(content) + 1), rng.choice(curses))
+                event.update({"type": "message", "user_id": str(user), "username": f"user{user}",
+                              "content": " ".join(content)})
+            # Ban targets must be members of the guild, so make sure they have joined before the ban arrives
+            if event["type"] == "message" and event.get("author_is_mod") and "unban" not in event["content"]:
+                w.write(json.dumps({"t": event["t"], "type": "join", "guild_id": str(guild), "user_id": str(user),
+                                    "username": f"user{user}"}) + "\n")
+            w.write(json.dumps(event) + "\n")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay Discord event traces through the moderation pipeline")
+    parser.add_argument("trace", help="JSONL trace file to replay, or to write with --generate")
+    parser.add_argument("--generate", action="store_true", help="write a synthetic trace instead of replaying one")
+    parser.add_argument("--events", type=int, default=1000, help="number of synthetic events")
+    parser.add_argument("--rate", type=float, default=100.0, help="synthetic events per second")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the synthetic trace")
+    parser.add_argument("--speedup", type=float, default=1.0, help="replay speed multiplier, 0 for as fast as possible")
+    parser.add_argument("--concurrency", type=int, default=100, help="maximum events in flight")
+    parser.add_argument("--discord-latency", type=float, default=0.0, help="seconds each fake Discord call awaits")
+    parser.add_argument("--storage-latency", type=float, default=0.0,
+                        help="seconds each storage call blocks for, blocking the event loop like pymongo does")
+    parser.add_argument("--prefix", default="!", help="command prefix")
+    args = parser.parse_args()
+
+    if args.generate:
+        generate_trace(args.trace, args.events, args.rate, prefix=args.prefix, seed=args.seed)
+        print(f"Wrote {args.events} synthetic events to {args.trace}")
+        return
+
+    faked = install_fake_modules()
+    if faked:
+        print(f"Using fakes for: {', '.join(faked)}")
+
+    storage = MemoryStorage(args.storage_latency)
+    await storage.init()
+    bot = FakeBot(storage, args.prefix, args.discord_latency)
+    with tempfile.TemporaryDirectory() as manifest_dir:
+        # The moderation commands live in commands/disabled, so they get their own manifest rather than the bot's
+        registry = CommandRegistry(bot, manifest_path=os.path.join(manifest_dir, "command_manifest.json"),
+                                   include_disabled=True)
+        registry.load()
+        # Import every command before the clock starts, a command that can't load would otherwise only show up as errors
+        try:
+            registry.preload()
+        except ImportError as e:
+            raise SystemExit(f"Could not import the moderation commands: {e}")
+
+        harness = ReplayHarness(bot, registry)
+        duration = await harness.replay(read_trace(args.trace), args.speedup, args.concurrency)
+    print(harness.report(duration))
+    registry.print_import_profile()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())